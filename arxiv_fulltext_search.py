@@ -13,21 +13,30 @@ Notes:
 - Some results are loaded dynamically via JavaScript; if you get empty results, add `--render`.
 - It then calls the official arXiv Atom API to fetch rich metadata for those IDs.
 - Affiliations are included if present in the Atom feed (some entries omit them).
+- Metadata is cached on disk (arxiv_meta.db) per arXiv ID for 30 days; use --no-cache to bypass.
 - Be mindful of arXiv's rate limits; the script sleeps politely between requests.
+- Metadata batches are fetched with aiohttp over one connection by default, spaced
+  3 s apart as arXiv's API terms require (`concurrency` > 1 is opt-in).
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
 import csv
 import re
+import shelve
 import sys
 import time
-from typing import Dict, Iterable, List, Optional, Set
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urljoin
 
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
-import feedparser
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 # Optional JS rendering (enabled with --render)
 try:
@@ -37,6 +46,14 @@ try:
 except Exception:
     HAS_PLAYWRIGHT = False
 
+# Optional pandas backend for CSV export (falls back to the csv module)
+try:
+    import pandas as pd  # type: ignore
+
+    HAS_PANDAS = True
+except Exception:
+    HAS_PANDAS = False
+
 SEARCH_BASE = "https://search.arxiv.org/"
 ARXIV_API = "http://export.arxiv.org/api/query"
 USER_AGENT = (
@@ -44,64 +61,64 @@ USER_AGENT = (
     "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
 )
 
+# On-disk metadata cache, keyed by bare arXiv ID (without version suffix).
+CACHE_PATH = "arxiv_meta.db"
+CACHE_TTL = 30 * 24 * 3600  # seconds; journal_ref/DOI may be added after publication
+VERSION_RE = re.compile(r"v\d+$")
+
+# Transient HTTP errors worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
 ARXIV_ID_RE = re.compile(
     r"arxiv\.org/(?:abs|pdf)/((?:\d{4}\.\d{4,5})|(?:[a-z\-]+/\d{7}))",
     re.I,
 )
+# ID inside an Atom <id> URL, e.g. http://arxiv.org/abs/2101.00001v1 or .../abs/quant-ph/0101001v2
+_ENTRY_ID_RE = re.compile(r"arxiv\.org/(?:abs|pdf)/([\w./-]+)")
 
 
-def http_get(url: str, params: Optional[dict] = None, *, retries: int = 3, timeout: int = 30) -> requests.Response:
-    session = requests.Session()
-    session.headers.update({"User-Agent": USER_AGENT})
-    last_exc = None
-    for attempt in range(1, retries + 1):
-        try:
-            resp = session.get(url, params=params, timeout=timeout)
-            resp.raise_for_status()
-            return resp
-        except Exception as e:
-            last_exc = e
-            if attempt < retries:
-                time.sleep(1.5 * attempt)
-            else:
-                raise
-    raise last_exc  # type: ignore[misc]
+# Shared session: keeps TCP/TLS connections alive across pages and API batches.
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": USER_AGENT})
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=1.5, status_forcelist=RETRY_STATUSES),
+)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
+
+def http_get(url: str, params: Optional[dict] = None, *, timeout: int = 30) -> requests.Response:
+    resp = SESSION.get(url, params=params, timeout=timeout)
+    resp.raise_for_status()
+    return resp
 
 
 def extract_ids_from_search_html(html: str) -> Set[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    ids: Set[str] = set()
-    for a in soup.find_all("a", href=True):
-        m = ARXIV_ID_RE.search(a["href"])
-        if m:
-            ids.add(m.group(1))
-    return ids
+    # ARXIV_ID_RE is anchored on arxiv.org/(abs|pdf)/, so scanning the raw
+    # HTML finds the same IDs as walking every <a href> without building a DOM.
+    return set(ARXIV_ID_RE.findall(html))
 
 
 def find_next_page_url(html: str) -> Optional[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    candidates = [
-        a for a in soup.find_all("a", href=True)
-        if a.get_text(strip=True).lower() in {"next", "next >", ">", "next page"}
-           or ("next" in (a.get("rel") or []))
-    ]
-    for a in candidates:
-        href = a["href"]
-        if href.startswith("http"):
-            return href
-        else:
-            return requests.compat.urljoin(SEARCH_BASE, href)
-    for a in soup.find_all("a", href=True, rel=True):
-        rels = {r.lower() for r in a.get("rel", [])}
-        if "next" in rels:
-            href = a["href"]
-            if href.startswith("http"):
-                return href
-            else:
-                return requests.compat.urljoin(SEARCH_BASE, href)
+    # Walk the anchors once and reuse the list for both lookups.
+    anchors = BeautifulSoup(html, "lxml").find_all("a", href=True)
+    for a in anchors:
+        if (a.get_text(strip=True).lower() in {"next", "next >", ">", "next page"}
+                or "next" in (a.get("rel") or [])):
+            return urljoin(SEARCH_BASE, a["href"])
+    for a in anchors:
+        if "next" in {r.lower() for r in a.get("rel") or []}:
+            return urljoin(SEARCH_BASE, a["href"])
     return None
 
 
+def scan_page(html: str) -> Tuple[Set[str], Optional[str]]:
+    # IDs via regex, next link via a single soup parse.
+    return extract_ids_from_search_html(html), find_next_page_url(html)
+
+
 def search_fulltext_collect_ids(query: str, max_pages: int = 10, sleep_sec: float = 1.0) -> List[str]:
     params = {"query": query}
     url = SEARCH_BASE
@@ -109,11 +126,9 @@ def search_fulltext_collect_ids(query: str, max_pages: int = 10, sleep_sec: floa
     pages_fetched = 0
     while url and pages_fetched < max_pages:
         resp = http_get(url, params=params if pages_fetched == 0 else None)
-        html = resp.text
-        new_ids = extract_ids_from_search_html(html)
+        new_ids, next_url = scan_page(resp.text)
         seen_ids.update(new_ids)
         pages_fetched += 1
-        next_url = find_next_page_url(html)
         if not next_url:
             break
         url = next_url
@@ -162,90 +177,200 @@ def chunks(iterable: List[str], n: int) -> Iterable[List[str]]:
         yield iterable[i: i + n]
 
 
-def fetch_metadata_for_ids(arxiv_ids: List[str], *, batch_size: int = 50, sleep_sec: float = 3.0) -> List[Dict]:
+ATOM_NS = {"a": "http://www.w3.org/2005/Atom", "arxiv": "http://arxiv.org/schemas/atom"}
+
+
+def _text(el: etree._Element, path: str) -> Optional[str]:
+    value = el.findtext(path, namespaces=ATOM_NS)
+    return value.strip() if value is not None else None
+
+
+def parse_feed(xml: bytes) -> List[Dict]:
+    root = etree.fromstring(xml)
     results: List[Dict] = []
-    for batch in chunks(arxiv_ids, batch_size):
-        params = {"id_list": ",".join(batch)}
-        resp = http_get(ARXIV_API, params=params)
-        feed = feedparser.parse(resp.text)
-        for entry in feed.entries:
-            entry_id = entry.get("id", "")
-            arxiv_id = None
-            doi = entry.get("arxiv_doi") if "arxiv_doi" in entry else None
-            m = re.search(r"arxiv\.org/(?:abs|pdf)/([\w\.-/]+)", entry_id)
-            if m:
-                arxiv_id = m.group(1)
-            pdf_url = None
-            abs_url = None
-            for link in entry.get("links", []):
-                href = link.get("href")
-                if not href:
-                    continue
-                if link.get("type") == "application/pdf" or href.endswith(".pdf"):
-                    pdf_url = href
-                if "arxiv.org/abs/" in href:
-                    abs_url = href
-            authors = []
-            for a in entry.get("authors", []):
-                name = a.get("name") if isinstance(a, dict) else str(a)
-                aff = None
-                if hasattr(a, "get"):
-                    aff = a.get("affiliation") or a.get("arxiv_affiliation")
-                if not aff:
-                    aff = getattr(a, "arxiv_affiliation", None)
-                authors.append({"name": name, "affiliation": aff})
-            primary_cat = None
-            if "arxiv_primary_category" in entry:
-                primary_cat = entry.arxiv_primary_category.get("term")
-            categories = [t.get("term") for t in entry.get("tags", []) if t.get("term")]
-            comment = getattr(entry, "arxiv_comment", None)
-            journal_ref = getattr(entry, "arxiv_journal_ref", None)
-            result = {
-                "arxiv_id": arxiv_id,
-                "title": entry.get("title"),
-                "abstract": entry.get("summary"),
-                "published": entry.get("published"),
-                "updated": entry.get("updated"),
-                "authors": authors,
-                "primary_category": primary_cat,
-                "categories": categories,
-                "doi": doi,
-                "pdf_url": pdf_url,
-                "abs_url": abs_url,
-                "comment": comment,
-                "journal_ref": journal_ref,
-            }
-            results.append(result)
-        time.sleep(sleep_sec)
+    for entry in root.iterfind("a:entry", ATOM_NS):
+        entry_id = _text(entry, "a:id") or ""
+        arxiv_id = None
+        doi = _text(entry, "arxiv:doi")
+        m = _ENTRY_ID_RE.search(entry_id)
+        if m:
+            arxiv_id = m.group(1)
+        pdf_url = None
+        abs_url = None
+        for link in entry.iterfind("a:link", ATOM_NS):
+            href = link.get("href")
+            if not href:
+                continue
+            if link.get("type") == "application/pdf" or href.endswith(".pdf"):
+                pdf_url = href
+            if "arxiv.org/abs/" in href:
+                abs_url = href
+        authors = []
+        for a in entry.iterfind("a:author", ATOM_NS):
+            affs = [aff.text.strip() for aff in a.iterfind("arxiv:affiliation", ATOM_NS) if aff.text]
+            authors.append({"name": _text(a, "a:name"), "affiliation": ", ".join(affs) or None})
+        primary_cat = None
+        primary = entry.find("arxiv:primary_category", ATOM_NS)
+        if primary is not None:
+            primary_cat = primary.get("term")
+        categories = [t.get("term") for t in entry.iterfind("a:category", ATOM_NS) if t.get("term")]
+        result = {
+            "arxiv_id": arxiv_id,
+            "title": _text(entry, "a:title"),
+            "abstract": _text(entry, "a:summary"),
+            "published": _text(entry, "a:published"),
+            "updated": _text(entry, "a:updated"),
+            "authors": authors,
+            "primary_category": primary_cat,
+            "categories": categories,
+            "doi": doi,
+            "pdf_url": pdf_url,
+            "abs_url": abs_url,
+            "comment": _text(entry, "arxiv:comment"),
+            "journal_ref": _text(entry, "arxiv:journal_ref"),
+        }
+        results.append(result)
     return results
 
 
+async def _fetch_batch(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    batch: List[str],
+    *,
+    sleep_sec: float,
+    retries: int = 3,
+) -> List[Dict]:
+    # max_results defaults to 10, which would silently truncate larger id_list batches
+    params = {"id_list": ",".join(batch), "max_results": len(batch)}
+    async with sem:
+        for attempt in range(1, retries + 1):
+            try:
+                async with session.get(ARXIV_API, params=params) as resp:
+                    resp.raise_for_status()
+                    xml = await resp.read()
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Client errors (4xx other than 429) will not go away on retry
+                transient = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+                if transient and attempt < retries:
+                    await asyncio.sleep(1.5 * attempt)
+                else:
+                    raise
+        # Hold the permit for sleep_sec so at most `concurrency` requests are
+        # issued per sleep_sec window (one request every 3 s by default).
+        await asyncio.sleep(sleep_sec)
+    return await asyncio.to_thread(parse_feed, xml)
+
+
+async def fetch_metadata_async(
+    arxiv_ids: List[str],
+    *,
+    batch_size: int = 200,
+    sleep_sec: float = 3.0,
+    concurrency: int = 1,
+    timeout: int = 30,
+    cache_path: Optional[str] = CACHE_PATH,
+    cache_ttl: float = CACHE_TTL,
+) -> List[Dict]:
+    if cache_path is None:
+        return await _fetch_metadata_uncached(
+            arxiv_ids, batch_size=batch_size, sleep_sec=sleep_sec, concurrency=concurrency, timeout=timeout)
+    now = time.time()
+    with shelve.open(cache_path) as cache:
+        cached: Dict[str, Dict] = {}
+        missing: List[str] = []
+        for arxiv_id in arxiv_ids:
+            hit = cache.get(arxiv_id)
+            if hit is not None and now - hit["fetched"] < cache_ttl:
+                cached[arxiv_id] = hit["meta"]
+            else:
+                missing.append(arxiv_id)
+        fetched = await _fetch_metadata_uncached(
+            missing, batch_size=batch_size, sleep_sec=sleep_sec, concurrency=concurrency, timeout=timeout)
+        pending = set(missing)
+        unmatched: List[Dict] = []
+        for meta in fetched:
+            key = VERSION_RE.sub("", meta["arxiv_id"] or "")
+            if key not in pending:
+                unmatched.append(meta)
+                continue
+            pending.discard(key)
+            cached[key] = meta
+            cache[key] = {"fetched": now, "meta": meta}
+    # Keep the order of the requested IDs; entries the API returned under another ID go last.
+    return [cached[i] for i in arxiv_ids if i in cached] + unmatched
+
+
+async def _fetch_metadata_uncached(
+    arxiv_ids: List[str],
+    *,
+    batch_size: int,
+    sleep_sec: float,
+    concurrency: int,
+    timeout: int,
+) -> List[Dict]:
+    if not arxiv_ids:
+        return []
+    sem = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(ttl_dns_cache=300)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers={"User-Agent": USER_AGENT},
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as session:
+        batches = await asyncio.gather(*[
+            _fetch_batch(session, sem, batch, sleep_sec=sleep_sec)
+            for batch in chunks(arxiv_ids, batch_size)
+        ])
+    return [result for batch in batches for result in batch]
+
+
+def fetch_metadata_for_ids(arxiv_ids: List[str], *, batch_size: int = 200, sleep_sec: float = 3.0) -> List[Dict]:
+    return asyncio.run(fetch_metadata_async(arxiv_ids, batch_size=batch_size, sleep_sec=sleep_sec))
+
+
+CSV_HEADER = [
+    "arxiv_id", "title", "abstract", "published", "updated",
+    "authors", "primary_category", "categories", "doi", "pdf_url",
+    "abs_url", "comment", "journal_ref"
+]
+
+
+def _join_authors(authors: List[Dict]) -> str:
+    return "; ".join(f"{a['name']} ({a['affiliation']})" if a['affiliation'] else a['name'] for a in authors)
+
+
+def _csv_rows(data: Iterable[Dict]) -> Iterator[tuple]:
+    for item in data:
+        authors_str = _join_authors(item["authors"])
+        categories_str = ", ".join(item["categories"])
+        yield (
+            item["arxiv_id"], item["title"], item["abstract"], item["published"], item["updated"],
+            authors_str, item["primary_category"], categories_str, item["doi"], item["pdf_url"],
+            item["abs_url"], item["comment"], item["journal_ref"]
+        )
+
+
 def save_csv(data: List[Dict], out_path: str) -> None:
-    with open(out_path, "w", encoding="utf-8", newline="") as f:
+    if HAS_PANDAS:
+        df = pd.DataFrame(data, columns=CSV_HEADER)
+        df["authors"] = df["authors"].apply(_join_authors)
+        df["categories"] = df["categories"].apply(", ".join)
+        # Same line endings as csv.writer so both paths produce identical files
+        df.to_csv(out_path, index=False, columns=CSV_HEADER, encoding="utf-8", lineterminator="\r\n")
+        return
+    with open(out_path, "w", encoding="utf-8", newline="", buffering=1 << 20) as f:
         writer = csv.writer(f)
-        header = [
-            "arxiv_id", "title", "abstract", "published", "updated",
-            "authors", "primary_category", "categories", "doi", "pdf_url",
-            "abs_url", "comment", "journal_ref"
-        ]
-        writer.writerow(header)
-        for item in data:
-            authors_str = "; ".join(
-                [f"{a['name']} ({a['affiliation']})" if a['affiliation'] else a['name'] for a in item["authors"]]
-            )
-            categories_str = ", ".join(item["categories"])
-            row = [
-                item["arxiv_id"], item["title"], item["abstract"], item["published"], item["updated"],
-                authors_str, item["primary_category"], categories_str, item["doi"], item["pdf_url"],
-                item["abs_url"], item["comment"], item["journal_ref"]
-            ]
-            writer.writerow(row)
-
-
-def run(query: str, out_path: str, max_pages: int = 10, render: bool = False) -> None:
+        writer.writerow(CSV_HEADER)
+        writer.writerows(_csv_rows(data))
+
+
+def run(query: str, out_path: str, max_pages: int = 10, render: bool = False,
+        cache_path: Optional[str] = CACHE_PATH) -> None:
     ids = search_fulltext_collect_ids_render(query, max_pages=max_pages) if render else search_fulltext_collect_ids(
         query, max_pages=max_pages)
-    meta = fetch_metadata_for_ids(ids)
+    meta = asyncio.run(fetch_metadata_async(ids, cache_path=cache_path))
     save_csv(meta, out_path)
 
 
@@ -256,9 +381,12 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("--max-pages", type=int, default=10, help="Max pages to crawl from search.arxiv.org.")
     parser.add_argument("--render", action="store_true",
                         help="Use headless browser rendering (Playwright) for dynamic pages.")
+    parser.add_argument("--cache", default=CACHE_PATH, help="On-disk arXiv metadata cache (shelve file).")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch metadata from the arXiv API.")
     args = parser.parse_args(argv)
     try:
-        run(args.query, args.out, max_pages=args.max_pages, render=args.render)
+        run(args.query, args.out, max_pages=args.max_pages, render=args.render,
+            cache_path=None if args.no_cache else args.cache)
         print(f"Saved results to {args.out}")
         return 0
     except Exception as e:
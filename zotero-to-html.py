@@ -1,46 +1,162 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import re
 import warnings
+from html import escape as _e
+
+import aiohttp
 import requests
 
+ZOTERO_URL = "https://api.zotero.org/groups/5693788/items"
+PAGESIZE = 100
+CACHE_FILE = ".zotero_cache.json"
+# Problematic Unicode characters that may cause HTML rendering issues
+PROBLEMATIC_UNICODE_RE = re.compile("[\u2062\u200B-\u200D\uFEFF]")
+# Zotero's rich-text markup in titles, as it looks after html.escape()
+RICH_TEXT_TAG_RE = re.compile(
+    r"&lt;(/?(?:i|b|sub|sup)|/span|span class=&quot;nocase&quot;"
+    r"|span style=&quot;font-variant:small-caps;&quot;)&gt;"
+)
 
-def get_data():
+
+def page_url(start, pagesize=PAGESIZE):
     """
-    Fetches data from the Zotero API by making paginated requests.
+    Builds the URL of the Zotero API for one page of results.
+
+    Args:
+        start (int): Index of the first item of the page.
+        pagesize (int): Number of items per page.
 
     Returns:
-        dict: A dictionary where each key is the starting index of a batch of results,
-              and the corresponding value is the list of items in that batch.
+        str: The request URL.
     """
-    start = 0
-    pagesize = 100
-    all_data = {}
-
-    while True:
-        # URL of the Zotero API with specific parameters
-        url = (
-            f"https://api.zotero.org/groups/5693788/items?order=date&sort=desc&format=json"
-            f"&include=data&limit={pagesize}&start={start}"
-        )
-
-        try:
-            # Fetch the data from the API
-            response = requests.get(url)
+    return (
+        f"{ZOTERO_URL}?order=date&sort=desc&format=json"
+        f"&include=data&limit={pagesize}&start={start}"
+    )
+
+
+async def fetch_pages(offsets, pagesize=PAGESIZE):
+    """
+    Fetches several pages from the Zotero API concurrently.
+
+    Args:
+        offsets (iterable): Start indices of the pages to fetch.
+        pagesize (int): Number of items per page.
+
+    Returns:
+        list: (start, items) tuples in the order of offsets.
+    """
+
+    async def fetch(session, start):
+        async with session.get(page_url(start, pagesize)) as response:
             response.raise_for_status()  # Raises an error for 4XX/5XX responses
+            return start, await response.json()
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=8)) as session:
+        return await asyncio.gather(*[fetch(session, start) for start in offsets])
+
+
+def run_async(coro):
+    """
+    Runs a coroutine to completion, also when an event loop is already running
+    (e.g. when the # %% cells are executed in an IPython/Jupyter kernel).
+
+    Args:
+        coro (coroutine): The coroutine to run.
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data: {e}")
-            exit(1)
+    Returns:
+        The result of the coroutine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # asyncio.run() refuses to nest, so give the coroutine its own loop in a worker thread
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, coro).result()
 
-        items = response.json()
 
-        # Check if there are no more items
-        if not items:
-            break
+def load_cache(path=CACHE_FILE):
+    """
+    Loads the library version and data of a previous run.
 
-        all_data[start] = items
-        print(f"Fetched {len(items)} items, starting at {start}")
+    Args:
+        path (str): Path of the cache file.
 
-        start += pagesize
+    Returns:
+        dict: {"version": str, "data": list} or None if no usable cache exists.
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or not isinstance(cache.get("data"), list) or "version" not in cache:
+        return None
+    return cache
+
+
+def save_cache(version, data, path=CACHE_FILE):
+    """
+    Stores the library version and data for the next run.
 
+    Args:
+        version (str): Value of the 'Last-Modified-Version' header.
+        data (list): The items as returned by get_data().
+        path (str): Path of the cache file.
+    """
+    if not version:
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"version": version, "data": data}, file)
+
+
+def get_data():
+    """
+    Fetches data from the Zotero API by making paginated requests.
+
+    The first page is fetched synchronously to read the 'Total-Results' header;
+    all remaining pages are then fetched concurrently. If a cache from a previous
+    run exists, the first request is conditional on the cached library version
+    and the cached data is returned when Zotero answers 304 Not Modified.
+
+    Returns:
+        list: All items of the library, in API order.
+    """
+    all_data = []
+    cache = load_cache()
+    headers = {"If-Modified-Since-Version": cache["version"]} if cache else {}
+
+    try:
+        # Fetch the first page and the total number of items
+        response = requests.get(page_url(0), headers=headers)
+        if response.status_code == 304:
+            logging.info(f"Library unchanged since version {cache['version']}, using cached data")
+            return cache["data"]
+        response.raise_for_status()  # Raises an error for 4XX/5XX responses
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching data: {e}")
+        exit(1)
+
+    total = int(response.headers.get("Total-Results", 0))
+    pages = [(0, response.json())]
+
+    try:
+        pages += run_async(fetch_pages(range(PAGESIZE, total, PAGESIZE)))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f"Error fetching data: {e}")
+        exit(1)
+
+    for start, items in pages:
+        all_data.extend(items)
+        logging.info(f"Fetched {len(items)} items, starting at {start}")
+
+    save_cache(response.headers.get("Last-Modified-Version"), all_data)
     return all_data
 
 
@@ -49,79 +165,108 @@ def filter_items(data, exclude_types=None):
     Removes all items with certain itemTypes from the data.
 
     Args:
-        data (dict): The raw data from get_data().
+        data (list): The raw items from get_data().
         exclude_types (list): List of itemTypes to be removed.
 
     Returns:
-        dict: Filtered data structure like the original.
+        list: The remaining items.
     """
     if exclude_types is None:
         exclude_types = []
-    filtered_data = {}
-    for start, items in data.items():
-        filtered_items = []
-        for i, item in enumerate(items):
-            item_type = item["data"].get("itemType")
-            if item_type in exclude_types:
-                warnings.warn(
-                    f"Filtered out item at index {i} on page {start} with itemType '{item_type}': {item['data']}")
-            else:
-                filtered_items.append(item)
-        filtered_data[start] = filtered_items
+    filtered_data = []
+    for i, item in enumerate(data):
+        item_type = item["data"].get("itemType")
+        if item_type in exclude_types:
+            warnings.warn(
+                f"Filtered out item at index {i} with itemType '{item_type}': {item['data']}")
+        else:
+            filtered_data.append(item)
     return filtered_data
 
 
-def sanity_check_items(data, required_fields=None):
+def sanity_check_items(data, required_fields=None, check_unicode=True):
     """
     Checks if all items contain the required fields and warns about problematic unicode in titles.
 
     Args:
-        data (dict): The filtered data.
+        data (list): The filtered items.
         required_fields (list): List of required fields in item["data"].
+        check_unicode (bool): Whether to scan titles for problematic Unicode characters.
     """
     if required_fields is None:
         required_fields = ["title", "date", "creators"]
-    # Problematic Unicode characters that may cause HTML rendering issues
-    problematic_unicode_chars = ['\u2062', '\u200B', '\u200C', '\u200D', '\uFEFF']
-    for start, items in data.items():
-        for i, item in enumerate(items):
-            missing = [field for field in required_fields if field not in item["data"]]
-            title = item["data"].get("title", "<no title>")
-            # Check for problematic Unicode characters in the title
-            for char in title:
-                if char in problematic_unicode_chars:
-                    warnings.warn(
-                        f"Problematic Unicode character U+{ord(char):04X} ('{repr(char)}') found in title: '{title}'. "
-                        f"HTML may be rendered incorrectly.\nItem data: {item['data']}\n"
-                    )
-            # Check archiveID does not include the discouraged 'arxiv:' prefix
-            archive_id = item["data"].get("archiveID")
-            if archive_id and "arxiv" in archive_id.lower():
+    for i, item in enumerate(data):
+        missing = [field for field in required_fields if field not in item["data"]]
+        title = item["data"].get("title", "<no title>")
+        # Check for problematic Unicode characters in the title
+        if check_unicode:
+            for match in PROBLEMATIC_UNICODE_RE.finditer(title):
+                char = match.group()
                 warnings.warn(
-                    f"archiveID for title {title} on page {start} contains the prefix 'arxiv:': '{archive_id}'. "
-                    "Consider removing the 'arxiv:' prefix (use the bare identifier, e.g. '2101.00001')."
+                    f"Problematic Unicode character U+{ord(char):04X} ('{repr(char)}') found in title: '{title}'. "
+                    f"HTML may be rendered incorrectly.\nItem data: {item['data']}\n"
                 )
-            # Warn if any required fields are missing
-            if missing:
-                warnings.warn(
-                    f"Sanity check failed for item {i + 1} on page {start}: missing fields: {', '.join(missing)}\n"
-                    f"Item data: {item['data']}\n"
-                )
-            else:
-                print(f"Sanity check passed for item {i + 1} on page {start}: {item['data']}")
+        # Check archiveID does not include the discouraged 'arxiv:' prefix
+        archive_id = item["data"].get("archiveID")
+        if archive_id and "arxiv" in archive_id.lower():
+            warnings.warn(
+                f"archiveID for title {title} (item {i + 1}) contains the prefix 'arxiv:': '{archive_id}'. "
+                "Consider removing the 'arxiv:' prefix (use the bare identifier, e.g. '2101.00001')."
+            )
+        # Warn if any required fields are missing
+        if missing:
+            warnings.warn(
+                f"Sanity check failed for item {i + 1}: missing fields: {', '.join(missing)}\n"
+                f"Item data: {item['data']}\n"
+            )
+
+
+def add_tagsets(data):
+    """
+    Stores the set of tag names of each item under item["_tagset"], so the section
+    filters do not have to rebuild it.
+
+    Args:
+        data (list): The filtered items.
+    """
+    for item in data:
+        item["_tagset"] = frozenset(tag["tag"] for tag in item["data"].get("tags", []))
 
 
+parser = argparse.ArgumentParser(description="Convert the CQS Zotero library into an HTML bibliography.")
+parser.add_argument("-v", "--verbose", action="store_true",
+                    help="Log progress for every single item and scan titles for problematic Unicode.")
+# parse_known_args: ignore extra argv, e.g. the kernel arguments when run as # %% cells in IPython/Jupyter
+args = parser.parse_known_args()[0]
+logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
 # Data retrieval from Zotero API
 data = get_data()
 # Remove all items with itemType 'attachment'
 data = filter_items(data, exclude_types=["attachment", "note"])
-# Sanity check for required fields
+# Sanity check for required fields; the Unicode scan of the titles only runs with --verbose
 sanity_check_items(data, required_fields=[
     "creators", "title", "date", "DOI", "itemType", "tags"
-])
+], check_unicode=args.verbose)
+# Precompute tag membership once for all tag sections
+add_tagsets(data)
 
 
 # %%
+def escape_title(title):
+    """
+    HTML-escapes a title but keeps Zotero's rich-text tags
+    (<i>, <b>, <sub>, <sup>, <span class="nocase">, <span style="font-variant:small-caps;">).
+
+    Args:
+        title (str): The title as stored in Zotero.
+
+    Returns:
+        str: The escaped title with the allowed tags restored.
+    """
+    return RICH_TEXT_TAG_RE.sub(lambda m: "<" + m.group(1).replace("&quot;", '"') + ">", _e(title))
+
+
 def format_item(item):
     """
     Formats a Zotero item as an HTML list item.
@@ -130,33 +275,31 @@ def format_item(item):
         item (dict): A single Zotero item in JSON format.
 
     Returns:
-        str: An HTML string for the Zotero item.
+        str: An HTML string for the Zotero item; field values are HTML-escaped,
+             except for Zotero's rich-text tags in the title.
     """
-    html_item = "<li>"
-
-    # Add creators' names (First Initial + Last Name)
-    creators = item["data"].get("creators", [])
-    html_item += ", ".join([f"{creator['firstName'][0]}. {creator['lastName']}" for creator in creators])
+    d = item["data"]
+    itype = d["itemType"]
 
-    # Add title and DOI link
-    html_item += f'<br><strong>{item["data"]["title"]}.<br>'
+    # Creators' names (First Initial + Last Name)
+    creators = ", ".join([
+        f"{_e(creator['firstName'][0])}. {_e(creator['lastName'])}" for creator in d.get("creators", ())
+    ])
 
     # DOI link (if available)
-    if "DOI" in item["data"]:
-        html_item += f'<a href="https://doi.org/{item["data"]["DOI"]}" target="_blank" rel="noreferrer">'
-
-    # Custom handling for preprints
-    if item["data"]["itemType"] == "preprint":
-        html_item += format_preprint(item)
-
-    # Custom handling for journal articles
-    elif item["data"]["itemType"] == "journalArticle":
-        html_item += format_journal_article(item)
+    doi_link = f'<a href="https://doi.org/{_e(d["DOI"])}" target="_blank" rel="noreferrer">' if "DOI" in d else ""
 
-    # Add publication year from date
-    html_item += f'({item["data"]["date"].split("-")[0]})</a></strong></li>\n'
+    # Custom handling for preprints and journal articles
+    if itype == "preprint":
+        details = format_preprint(item)
+    elif itype == "journalArticle":
+        details = format_journal_article(item)
+    else:
+        details = ""
 
-    return html_item
+    # Title, DOI link, details and publication year from the ISO date (YYYY-MM-DD)
+    strong = f'<strong>{escape_title(d["title"])}.<br>{doi_link}{details}({d["date"][:4]})</a></strong>'
+    return f'<li>{creators}<br>{strong}</li>\n'
 
 
 def format_preprint(item):
@@ -171,7 +314,7 @@ def format_preprint(item):
     """
     html = ""
     try:
-        html += f'{item["data"]["repository"]}{item["data"]["archiveID"]} '
+        html += f'{_e(item["data"]["repository"])}{_e(item["data"]["archiveID"])} '
     except KeyError:
         warnings.warn(f'Missing repository or arXiv info for {item["data"]["title"]}')
     return html
@@ -189,40 +332,17 @@ def format_journal_article(item):
     """
     html = ""
     try:
-        html += f'{item["data"]["journalAbbreviation"]} Vol. {item["data"]["volume"]}, '
+        html += f'{_e(item["data"]["journalAbbreviation"])} Vol. {_e(item["data"]["volume"])}, '
     except KeyError:
         warnings.warn(f'Missing journal abbreviation for {item["data"]["title"]}')
     try:
-        html += f'{item["data"]["pages"]} '
+        html += f'{_e(item["data"]["pages"])} '
     except KeyError:
         warnings.warn(f'Missing page numbers for {item["data"]["title"]}')
     return html
 
 
-def process_items_by_tag(data, tag_filter):
-    """
-    Processes Zotero items by filtering them based on a specific tag and formats them into HTML.
-
-    Args:
-        data (dict): The complete Zotero data fetched from the API.
-        tag_filter (str): The tag to filter the items by (e.g., 'QUSP FOR5413').
-
-    Returns:
-        str: A concatenated HTML string containing the filtered items.
-    """
-    html = ""
-    for page_index in data.keys():
-        print(f"Processing {tag_filter}-tagged items starting at page {page_index}...")
-        for i, item in enumerate(data[page_index]):
-            tags = [tag["tag"] for tag in item["data"].get("tags", [])]
-            if tag_filter in tags:
-                print(f"  Adding item {i + 1}/{len(data[page_index])}")
-                html += format_item(item)
-    return html
-
-
-# Start building the HTML content
-html_content = '''
+HTML_HEADER = '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -235,26 +355,41 @@ html_content = '''
 <ol>
 '''
 
-# Process all items
-for page_index in data.keys():
-    print(f"Processing batch starting at page {page_index}...")
-    for i, item in enumerate(data[page_index]):
-        print(f"  {i + 1}/{len(data[page_index])}")
-        html_content += format_item(item)
-
-# Add a section for "QUSP-only"
-html_content += "</ol><h2 id=\"qusp-only\">QUSP-only</h2><ol>"
-html_content += process_items_by_tag(data, "QUSP FOR5413")
-
-# Add a section for "CoQuaDis-only"
-html_content += "</ol><h2 id=\"coquadis-only\">CoQuaDis-only</h2><ol>"
-html_content += process_items_by_tag(data, "Quantera Project CoQuaDis")
-
-# Close the HTML document
-html_content += "</ol></body></html>"
-
-# Write the HTML content to a file
-with open("bibliography.html", "w", encoding="utf-8") as file:
-    file.write(html_content)
-
-print("HTML file 'bibliography.html' has been created successfully.")
+# Stream the HTML content to a temporary file next to the output and move it into
+# place only once it is complete, so a failing item never leaves a truncated file
+tmp_path = "bibliography.html.tmp"
+try:
+    with open(tmp_path, "w", encoding="utf-8", buffering=1 << 20) as file:
+        file.write(HTML_HEADER)
+
+        # Write every item once; the tagged sections follow the full list, so only
+        # their fragments are buffered until the end
+        qusp_parts, coquadis_parts = [], []
+        logging.info(f"Processing {len(data)} items...")
+        for i, item in enumerate(data):
+            logging.debug(f"  {i + 1}/{len(data)}")
+            html_item = format_item(item)
+            file.write(html_item)
+            tags = item["_tagset"]
+            if "QUSP FOR5413" in tags:
+                qusp_parts.append(html_item)
+            if "Quantera Project CoQuaDis" in tags:
+                coquadis_parts.append(html_item)
+
+        # Add a section for "QUSP-only"
+        file.write("</ol><h2 id=\"qusp-only\">QUSP-only</h2><ol>")
+        file.writelines(qusp_parts)
+
+        # Add a section for "CoQuaDis-only"
+        file.write("</ol><h2 id=\"coquadis-only\">CoQuaDis-only</h2><ol>")
+        file.writelines(coquadis_parts)
+
+        # Close the HTML document
+        file.write("</ol></body></html>")
+    os.replace(tmp_path, "bibliography.html")
+except BaseException:
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    raise
+
+logging.info("HTML file 'bibliography.html' has been created successfully.")